@@ -3,94 +3,240 @@ Collector API - Device Posture Report Receiver
 Receives and processes device health reports from the Go agent
 """
 
-from fastapi import FastAPI, HTTPException
-from pydantic import BaseModel, Field
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException, Request, Response
+from fastapi.responses import ORJSONResponse, StreamingResponse
 from datetime import datetime
-from typing import Optional
+from typing import AsyncIterator, Iterator, List, Optional
+from typing_extensions import Annotated
+from storage import create_store
+import logging
+import logging.handlers
+import os
+import queue
+import time
 import uvicorn
 import json
+import msgspec
+import orjson
+
+# Configure logging: handlers only enqueue records and a background
+# listener thread does the actual stdout writes off the request path
+_log_queue = queue.Queue(-1)
+_log_stream = logging.StreamHandler()
+_log_stream.setFormatter(
+    logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+)
+_log_listener = logging.handlers.QueueListener(_log_queue, _log_stream)
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+logger.addHandler(logging.handlers.QueueHandler(_log_queue))
+logger.propagate = False
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Run the log listener for the lifetime of the server process"""
+    # Started here rather than at import: threads don't survive fork, so each
+    # Gunicorn worker forked from a --preload master needs its own listener
+    _log_listener.start()
+    yield
+    await store.close()
+    _log_listener.stop()
+
 
 app = FastAPI(
     title="Device Posture Collector API",
     description="Receives and processes device health reports",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=ORJSONResponse,
+    lifespan=lifespan
 )
 
-# In-memory storage for reports (in production, use a database)
-reports_db = []
+# Report storage: in-process by default, shared Redis when REDIS_URL is set
+# (required for consistent results with more than one Gunicorn worker)
+store = create_store(os.environ.get("REDIS_URL"))
 
+# Reports encoded per chunk when streaming GET /reports
+STREAM_BATCH_SIZE = 500
+
+_ALERT_FMT = (
+    "🚨 ALERT: Device %s is CRITICAL!\n"
+    "   IP: %s\n"
+    "   Disk Usage: %.2f%%\n"
+    "   Message: %s\n"
+    "   Timestamp: %s"
+)
 
-class DeviceStatus(BaseModel):
+# /report confirmation bodies, pre-encoded around the per-report fields
+_UNHEALTHY_RESP_PREFIX = b'{"msg":"Report received - UNHEALTHY device detected","alert":true,"device":'
+_UNHEALTHY_RESP_SUFFIX = b',"action_required":"Immediate attention needed"}'
+_HEALTHY_RESP_PREFIX = b'{"msg":"Report received successfully","alert":false,"device":'
+
+# GET / never changes, so its body is encoded once at import
+_ROOT_BODY = orjson.dumps({
+    "service": "Device Posture Collector API",
+    "version": "1.0.0",
+    "endpoints": {
+        "/report": "POST - Submit device status report",
+        "/report/batch": "POST - Submit a list of device status reports",
+        "/reports": "GET - View all received reports",
+        "/reports/unhealthy": "GET - View unhealthy devices",
+        "/health": "GET - API health check"
+    }
+})
+
+# GET /health body around its two changing fields
+_HEALTH_PREFIX = b'{"status":"healthy","service":"collector-api","timestamp":"'
+_HEALTH_SUFFIX = b'","reports_received":%d}'
+
+# Formatted health timestamp, re-rendered at most once per second
+_health_second = 0
+_health_timestamp = b""
+
+
+class DeviceStatus(msgspec.Struct):
     """Device status model matching the Go agent's data structure"""
-    hostname: str = Field(..., description="Device hostname")
-    ip: str = Field(..., description="Device IP address")
-    disk_usage: float = Field(..., description="Disk usage percentage", ge=0, le=100)
-    status: str = Field(..., description="Health status (HEALTHY/UNHEALTHY)")
-    timestamp: datetime = Field(..., description="Report timestamp")
-    message: Optional[str] = Field(None, description="Additional status message")
+    hostname: Annotated[str, msgspec.Meta(description="Device hostname")]
+    ip: Annotated[str, msgspec.Meta(description="Device IP address")]
+    disk_usage: Annotated[float, msgspec.Meta(description="Disk usage percentage", ge=0, le=100)]
+    status: Annotated[str, msgspec.Meta(description="Health status (HEALTHY/UNHEALTHY)")]
+    timestamp: Annotated[datetime, msgspec.Meta(description="Report timestamp")]
+    message: Annotated[Optional[str], msgspec.Meta(description="Additional status message")] = None
 
 
-@app.get("/")
-def root():
-    """Root endpoint with API information"""
+def openapi_body(schema) -> dict:
+    """
+    OpenAPI requestBody for a msgspec type, used by routes that decode the raw body
+    
+    msgspec emits struct definitions as $refs into its own $defs, which
+    the OpenAPI document doesn't carry, so they are inlined here.
+    """
+    (root,), defs = msgspec.json.schema_components([schema], ref_template="{name}")
+    
+    def inline(node):
+        if isinstance(node, dict):
+            if "$ref" in node:
+                return inline(defs[node["$ref"]])
+            return {k: inline(v) for k, v in node.items()}
+        if isinstance(node, list):
+            return [inline(v) for v in node]
+        return node
+    
     return {
-        "service": "Device Posture Collector API",
-        "version": "1.0.0",
-        "endpoints": {
-            "/report": "POST - Submit device status report",
-            "/reports": "GET - View all received reports",
-            "/reports/unhealthy": "GET - View unhealthy devices",
-            "/health": "GET - API health check"
+        "requestBody": {
+            "required": True,
+            "content": {"application/json": {"schema": inline(root)}}
         }
     }
 
 
-@app.post("/report")
-def receive_report(data: DeviceStatus):
+def decode_report(body: bytes, schema=DeviceStatus):
+    """Decode and validate a JSON report body in one pass, 422 on bad input"""
+    try:
+        return msgspec.json.decode(body, type=schema)
+    except msgspec.DecodeError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+
+def health_timestamp() -> bytes:
+    """Current local time as ISO 8601 bytes at one-second resolution"""
+    global _health_second, _health_timestamp
+    second = int(time.time())
+    if second != _health_second:
+        _health_second = second
+        _health_timestamp = datetime.fromtimestamp(second).isoformat().encode()
+    return _health_timestamp
+
+
+async def stream_reports(total: int, reports: Iterator[bytes]) -> AsyncIterator[bytes]:
+    """Emit the /reports JSON body in chunks as the encoded reports arrive"""
+    yield b'{"total_reports":%d,"reports":[' % total
+    separator = b""
+    batch = []
+    for report in reports:
+        batch.append(report)
+        if len(batch) == STREAM_BATCH_SIZE:
+            yield separator + b",".join(batch)
+            separator = b","
+            batch = []
+    if batch:
+        yield separator + b",".join(batch)
+    yield b"]}"
+
+
+@app.get("/")
+async def root():
+    """Root endpoint with API information"""
+    return Response(_ROOT_BODY, media_type="application/json")
+
+
+@app.post("/report", openapi_extra=openapi_body(DeviceStatus))
+async def receive_report(request: Request):
     """
     Receive and process device status report
     
     Args:
-        data: DeviceStatus object containing device health information
+        request: Request whose JSON body is a DeviceStatus report
     
     Returns:
         Confirmation message with any alerts
     """
+    data = decode_report(await request.body())
+    
     # Store the report
-    report_dict = data.model_dump()
-    reports_db.append(report_dict)
+    report_dict = msgspec.to_builtins(data)
+    await store.add(report_dict)
     
     # Check if device is unhealthy
     if data.status == "UNHEALTHY":
-        alert_msg = (
-            f"🚨 ALERT: Device {data.hostname} is CRITICAL!\n"
-            f"   IP: {data.ip}\n"
-            f"   Disk Usage: {data.disk_usage:.2f}%\n"
-            f"   Message: {data.message}\n"
-            f"   Timestamp: {data.timestamp}"
+        logger.warning(
+            _ALERT_FMT, data.hostname, data.ip, data.disk_usage, data.message, data.timestamp
         )
-        print(alert_msg)
         
-        return {
-            "msg": "Report received - UNHEALTHY device detected",
-            "alert": True,
-            "device": data.hostname,
-            "action_required": "Immediate attention needed"
-        }
+        return Response(
+            _UNHEALTHY_RESP_PREFIX + orjson.dumps(data.hostname) + _UNHEALTHY_RESP_SUFFIX,
+            media_type="application/json"
+        )
     
     # Healthy device
-    print(f"✓ Report received from {data.hostname} ({data.ip}) - Status: {data.status}")
+    logger.info("✓ Report received from %s (%s) - Status: %s", data.hostname, data.ip, data.status)
     
-    return {
-        "msg": "Report received successfully",
-        "alert": False,
-        "device": data.hostname,
-        "status": data.status
-    }
+    return Response(
+        _HEALTHY_RESP_PREFIX + orjson.dumps(data.hostname)
+        + b',"status":' + orjson.dumps(data.status) + b"}",
+        media_type="application/json"
+    )
+
+
+@app.post("/report/batch", openapi_extra=openapi_body(List[DeviceStatus]))
+async def receive_report_batch(request: Request):
+    """
+    Receive a batch of device status reports in one request
+    
+    Args:
+        request: Request whose JSON body is a list of DeviceStatus reports
+    
+    Returns:
+        Number of reports accepted
+    """
+    batch = decode_report(await request.body(), List[DeviceStatus])
+    
+    await store.add_many([msgspec.to_builtins(data) for data in batch])
+    
+    for data in batch:
+        if data.status == "UNHEALTHY":
+            logger.warning(
+                _ALERT_FMT, data.hostname, data.ip, data.disk_usage, data.message, data.timestamp
+            )
+    logger.info("✓ Batch of %d reports received", len(batch))
+    
+    return Response(b'{"accepted":%d}' % len(batch), media_type="application/json")
 
 
 @app.get("/reports")
-def get_all_reports(limit: int = 50):
+async def get_all_reports(limit: int = 50):
     """
     Get all received reports
     
@@ -100,29 +246,30 @@ def get_all_reports(limit: int = 50):
     Returns:
         List of device reports
     """
-    return {
-        "total_reports": len(reports_db),
-        "reports": reports_db[-limit:] if limit > 0 else reports_db
-    }
+    total, reports = await store.stream_recent(limit)
+    return StreamingResponse(
+        stream_reports(total, reports),
+        media_type="application/json"
+    )
 
 
 @app.get("/reports/unhealthy")
-def get_unhealthy_reports():
+async def get_unhealthy_reports():
     """
     Get all reports from unhealthy devices
     
     Returns:
         List of unhealthy device reports
     """
-    unhealthy = [r for r in reports_db if r.get("status") == "UNHEALTHY"]
-    return {
-        "total_unhealthy": len(unhealthy),
-        "unhealthy_devices": unhealthy
-    }
+    total, unhealthy = await store.unhealthy_reports()
+    return Response(
+        b'{"total_unhealthy":%d,"unhealthy_devices":[%s]}' % (total, b",".join(unhealthy)),
+        media_type="application/json"
+    )
 
 
 @app.get("/reports/{hostname}")
-def get_device_reports(hostname: str, limit: int = 10):
+async def get_device_reports(hostname: str, limit: int = 10):
     """
     Get reports for a specific device
     
@@ -133,37 +280,34 @@ def get_device_reports(hostname: str, limit: int = 10):
     Returns:
         List of reports for the specified device
     """
-    device_reports = [r for r in reports_db if r.get("hostname") == hostname]
+    total, device_reports = await store.for_host(hostname, limit)
     
-    if not device_reports:
+    if not total:
         raise HTTPException(status_code=404, detail=f"No reports found for device: {hostname}")
     
-    return {
-        "hostname": hostname,
-        "total_reports": len(device_reports),
-        "reports": device_reports[-limit:]
-    }
+    return Response(
+        b'{"hostname":%s,"total_reports":%d,"reports":[%s]}'
+        % (orjson.dumps(hostname), total, b",".join(device_reports)),
+        media_type="application/json"
+    )
 
 
 @app.get("/health")
-def health_check():
+async def health_check():
     """API health check endpoint"""
-    return {
-        "status": "healthy",
-        "service": "collector-api",
-        "timestamp": datetime.now().isoformat(),
-        "reports_received": len(reports_db)
-    }
+    return Response(
+        _HEALTH_PREFIX + health_timestamp() + _HEALTH_SUFFIX % await store.count(),
+        media_type="application/json"
+    )
 
 
 @app.delete("/reports")
-def clear_reports():
+async def clear_reports():
     """Clear all stored reports (use with caution)"""
-    count = len(reports_db)
-    reports_db.clear()
+    count = await store.clear()
     return {
         "msg": f"Cleared {count} reports",
-        "reports_remaining": len(reports_db)
+        "reports_remaining": await store.count()
     }
 
 
@@ -0,0 +1,207 @@
+"""
+Report Storage - Backends for the Collector API's device reports
+In-process deques for a single worker, Redis when workers must share state
+"""
+
+from collections import defaultdict, deque
+from itertools import islice
+from typing import Iterator, List, Optional, Tuple
+import sys
+import orjson
+
+# Retention limits; oldest reports are evicted first
+MAX_REPORTS = 10_000
+MAX_REPORTS_PER_HOST = 1_000
+MAX_UNHEALTHY_REPORTS = 1_000
+
+
+def latest(reports, limit):
+    """Return the newest `limit` reports in arrival order without copying the whole deque"""
+    if limit <= 0:
+        return list(reports)
+    return list(islice(reversed(reports), limit))[::-1]
+
+
+class MemoryReportStore:
+    """
+    Bounded in-process report storage, private to the current worker
+
+    Reports are kept as row dicts. Every read is a tail slice of a deque
+    that is already filtered at ingest (all, per host, unhealthy), so no
+    query scans the full store.
+    """
+
+    def __init__(self):
+        self.reports = deque(maxlen=MAX_REPORTS)
+        # Indexes over the same report dicts so lookups don't scan self.reports
+        self.by_host = defaultdict(lambda: deque(maxlen=MAX_REPORTS_PER_HOST))
+        self.unhealthy = deque(maxlen=MAX_UNHEALTHY_REPORTS)
+        # Every UNHEALTHY report since the last clear, including evicted ones
+        self.unhealthy_count = 0
+
+    async def add(self, report: dict):
+        """Store a report and index it by hostname and health status"""
+        # The same few hostnames, IPs and statuses repeat across thousands of
+        # retained reports; interning makes them share one string object each
+        report["hostname"] = sys.intern(report["hostname"])
+        report["ip"] = sys.intern(report["ip"])
+        report["status"] = sys.intern(report["status"])
+        self.reports.append(report)
+        self.by_host[report["hostname"]].append(report)
+        if report["status"] == "UNHEALTHY":
+            self.unhealthy.append(report)
+            self.unhealthy_count += 1
+
+    async def add_many(self, reports: List[dict]):
+        """Store a batch of reports in order"""
+        for report in reports:
+            await self.add(report)
+
+    async def count(self) -> int:
+        """Number of reports currently retained"""
+        return len(self.reports)
+
+    async def stream_recent(self, limit: int) -> Tuple[int, Iterator[bytes]]:
+        """
+        Retained report count and the newest `limit` reports (all when
+        limit <= 0), oldest first, encoded lazily as the iterator is consumed
+        """
+        # Count and snapshot together, before the response starts streaming,
+        # so reports ingested meanwhile can't make the two disagree
+        snapshot = latest(self.reports, limit)
+        return len(self.reports), (orjson.dumps(r) for r in snapshot)
+
+    async def unhealthy_reports(self) -> Tuple[int, List[bytes]]:
+        """UNHEALTHY report count and the retained ones JSON-encoded, oldest first"""
+        return self.unhealthy_count, [orjson.dumps(r) for r in self.unhealthy]
+
+    async def for_host(self, hostname: str, limit: int) -> Tuple[int, List[bytes]]:
+        """Retained report count for a device and its newest `limit` reports JSON-encoded"""
+        device_reports = self.by_host.get(hostname)
+        if not device_reports:
+            return 0, []
+        return len(device_reports), [orjson.dumps(r) for r in latest(device_reports, limit)]
+
+    async def clear(self) -> int:
+        """Drop every stored report and return how many were removed"""
+        count = len(self.reports)
+        self.reports.clear()
+        self.by_host.clear()
+        self.unhealthy.clear()
+        self.unhealthy_count = 0
+        return count
+
+    async def close(self):
+        """Nothing to release for in-process storage"""
+
+
+class RedisReportStore:
+    """
+    Report storage shared by every worker through Redis
+
+    Each report is stored once per list it belongs to as its JSON
+    encoding; lists are newest-first and capped with LTRIM.
+    """
+
+    RECENT_KEY = "reports:recent"
+    UNHEALTHY_KEY = "reports:unhealthy"
+    UNHEALTHY_COUNT_KEY = "reports:unhealthy:count"
+    HOSTS_KEY = "reports:hosts"
+    HOST_KEY = "reports:host:{}"
+
+    def __init__(self, url: str):
+        # Imported here so the in-memory backend works without redis installed
+        from redis import asyncio as aioredis
+        self.redis = aioredis.from_url(url)
+
+    def _queue_add(self, pipe, report: dict):
+        """Queue the commands that store and index one report on a pipeline"""
+        payload = orjson.dumps(report)
+        host_key = self.HOST_KEY.format(report["hostname"])
+        pipe.lpush(self.RECENT_KEY, payload).ltrim(self.RECENT_KEY, 0, MAX_REPORTS - 1)
+        pipe.lpush(host_key, payload).ltrim(host_key, 0, MAX_REPORTS_PER_HOST - 1)
+        pipe.sadd(self.HOSTS_KEY, report["hostname"])
+        if report["status"] == "UNHEALTHY":
+            pipe.lpush(self.UNHEALTHY_KEY, payload)
+            pipe.ltrim(self.UNHEALTHY_KEY, 0, MAX_UNHEALTHY_REPORTS - 1)
+            pipe.incr(self.UNHEALTHY_COUNT_KEY)
+
+    async def add(self, report: dict):
+        """Store a report and index it by hostname and health status"""
+        pipe = self.redis.pipeline(transaction=False)
+        self._queue_add(pipe, report)
+        await pipe.execute()
+
+    async def add_many(self, reports: List[dict]):
+        """Store a batch of reports in order with a single round trip"""
+        pipe = self.redis.pipeline(transaction=False)
+        for report in reports:
+            self._queue_add(pipe, report)
+        await pipe.execute()
+
+    async def count(self) -> int:
+        """Number of reports currently retained"""
+        return await self.redis.llen(self.RECENT_KEY)
+
+    async def _newest_payloads(self, key: str, limit: int) -> List[bytes]:
+        """Read the newest `limit` entries of a list key, oldest first"""
+        payloads = await self.redis.lrange(key, 0, limit - 1 if limit > 0 else -1)
+        payloads.reverse()
+        return payloads
+
+    async def stream_recent(self, limit: int) -> Tuple[int, Iterator[bytes]]:
+        """
+        Retained report count and the newest `limit` reports (all when
+        limit <= 0), oldest first, as their stored JSON encoding
+        """
+        # LLEN and LRANGE run in one MULTI so the count matches the snapshot
+        pipe = self.redis.pipeline()
+        pipe.llen(self.RECENT_KEY)
+        pipe.lrange(self.RECENT_KEY, 0, limit - 1 if limit > 0 else -1)
+        total, payloads = await pipe.execute()
+        payloads.reverse()
+        return total, iter(payloads)
+
+    async def unhealthy_reports(self) -> Tuple[int, List[bytes]]:
+        """UNHEALTHY report count and the retained ones JSON-encoded, oldest first"""
+        count = await self.redis.get(self.UNHEALTHY_COUNT_KEY)
+        return int(count or 0), await self._newest_payloads(self.UNHEALTHY_KEY, 0)
+
+    async def for_host(self, hostname: str, limit: int) -> Tuple[int, List[bytes]]:
+        """Retained report count for a device and its newest `limit` reports JSON-encoded"""
+        host_key = self.HOST_KEY.format(hostname)
+        total = await self.redis.llen(host_key)
+        if not total:
+            return 0, []
+        return total, await self._newest_payloads(host_key, limit)
+
+    async def clear(self) -> int:
+        """Drop every stored report and return how many were removed"""
+        hostnames = await self.redis.smembers(self.HOSTS_KEY)
+        pipe = self.redis.pipeline()
+        pipe.llen(self.RECENT_KEY)
+        pipe.delete(
+            self.RECENT_KEY,
+            self.UNHEALTHY_KEY,
+            self.UNHEALTHY_COUNT_KEY,
+            self.HOSTS_KEY,
+            *(self.HOST_KEY.format(h.decode()) for h in hostnames)
+        )
+        count, _ = await pipe.execute()
+        return count
+
+    async def close(self):
+        """Close the Redis connection pool"""
+        await self.redis.aclose()
+
+
+def create_store(redis_url: Optional[str] = None):
+    """
+    Pick the report storage backend
+
+    Args:
+        redis_url: Redis connection URL; in-process storage is used when empty
+    """
+    if redis_url:
+        return RedisReportStore(redis_url)
+    return MemoryReportStore()
@@ -3,10 +3,13 @@ FastAPI Policy Engine for Secure Web Gateway
 Serves blocklist policies to the Go proxy server
 """
 
-from fastapi import FastAPI
-from fastapi.responses import JSONResponse
-from typing import List
+from fastapi import FastAPI, Request, Response
+from fastapi.responses import ORJSONResponse
+from datetime import datetime, timezone
+from typing import Optional, Set
+import hashlib
 import logging
+import orjson
 
 # Configure logging
 logging.basicConfig(
@@ -18,11 +21,12 @@ logger = logging.getLogger(__name__)
 app = FastAPI(
     title="Cisco SWG Policy Engine",
     description="Policy management API for Secure Web Gateway",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=ORJSONResponse
 )
 
 # In-memory blocklist (in production, this would come from a database)
-BLOCKED_DOMAINS = [
+BLOCKED_DOMAINS: Set[str] = {
     "facebook.com",
     "tiktok.com",
     "twitter.com",
@@ -32,36 +36,107 @@ BLOCKED_DOMAINS = [
     "gambling.com",
     "bet365.com",
     "pokerstars.com"
-]
+}
+
+# Bodies for the fixed GET / and GET /health responses, encoded once at import
+_ROOT_BODY = orjson.dumps({
+    "service": "Cisco SWG Policy Engine",
+    "status": "running",
+    "version": "1.0.0"
+})
+_HEALTH_BODY = orjson.dumps({"status": "healthy"})
+
+# When the blocklist last changed, reported to the proxy alongside the domains
+_last_updated = "2026-02-16T00:00:00Z"
+
+# Pre-serialized GET /policy body; the blocklist only changes on add/remove
+_policy_cache_bytes = b""
+_policy_etag = ""
+
+# Pre-serialized GET /policy/domains body, rebuilt alongside the policy body
+_domains_cache_bytes = b""
+
+# How long clients may reuse a fetched policy before revalidating
+POLICY_MAX_AGE = 5
+
+# Label counts present in the blocklist (e.g. {2} for "facebook.com"), deepest
+# first; host suffixes of any other length can never match
+_blocked_depths = ()
+
+
+def _rebuild_cache():
+    """Re-derive the cached response bodies and match index from the blocklist"""
+    global _policy_cache_bytes, _policy_etag, _domains_cache_bytes, _blocked_depths
+    _blocked_depths = tuple(sorted({d.count(".") + 1 for d in BLOCKED_DOMAINS}, reverse=True))
+    domains = sorted(BLOCKED_DOMAINS)
+    _domains_cache_bytes = orjson.dumps({
+        "domains": domains,
+        "total": len(BLOCKED_DOMAINS)
+    })
+    _policy_cache_bytes = orjson.dumps({
+        "blocked": domains,
+        "total": len(BLOCKED_DOMAINS),
+        "last_updated": _last_updated
+    })
+    _policy_etag = '"%s"' % hashlib.blake2b(_policy_cache_bytes, digest_size=8).hexdigest()
+
+
+def _policy_changed():
+    """Stamp the blocklist as modified and refresh the cached policy body"""
+    global _last_updated
+    _last_updated = datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+    _rebuild_cache()
+
+
+def _match_blocked(host: str) -> Optional[str]:
+    """
+    Find the blocklist entry covering a host, mirroring the Go proxy's check
+    
+    Matches the host itself or any parent domain (www.facebook.com also
+    matches facebook.com), most specific first. Only suffixes whose label
+    count occurs in the blocklist are probed, so most hosts are rejected
+    after one or two set lookups.
+    """
+    domain = host.split(":")[0].lower().strip()
+    if not domain:
+        return None
+    labels = domain.split(".")
+    for depth in _blocked_depths:
+        if depth > len(labels):
+            continue
+        candidate = ".".join(labels[-depth:])
+        if candidate in BLOCKED_DOMAINS:
+            return candidate
+    return None
+
+
+_rebuild_cache()
 
 
 @app.get("/")
 async def root():
     """Health check endpoint"""
-    return {
-        "service": "Cisco SWG Policy Engine",
-        "status": "running",
-        "version": "1.0.0"
-    }
+    return Response(content=_ROOT_BODY, media_type="application/json")
 
 
 @app.get("/policy")
-async def get_policy():
+async def get_policy(request: Request):
     """
     Returns the current blocklist policy
     
+    Clients that send the last ETag in If-None-Match get an empty
+    304 Not Modified while the blocklist is unchanged.
+    
     Returns:
         JSON object with blocked domains list
     """
+    headers = {"ETag": _policy_etag, "Cache-Control": f"max-age={POLICY_MAX_AGE}"}
+    if request.headers.get("if-none-match") == _policy_etag:
+        return Response(status_code=304, headers=headers)
+    
     logger.info(f"Policy requested - returning {len(BLOCKED_DOMAINS)} blocked domains")
     
-    return JSONResponse(
-        content={
-            "blocked": BLOCKED_DOMAINS,
-            "total": len(BLOCKED_DOMAINS),
-            "last_updated": "2026-02-16T00:00:00Z"
-        }
-    )
+    return Response(content=_policy_cache_bytes, media_type="application/json", headers=headers)
 
 
 @app.post("/policy/add")
@@ -81,7 +156,8 @@ async def add_domain(domain: str):
             "message": f"{domain} is already in the blocklist"
         }
     
-    BLOCKED_DOMAINS.append(domain)
+    BLOCKED_DOMAINS.add(domain)
+    _policy_changed()
     logger.info(f"Added domain to blocklist: {domain}")
     
     return {
@@ -108,7 +184,8 @@ async def remove_domain(domain: str):
             "message": f"{domain} is not in the blocklist"
         }
     
-    BLOCKED_DOMAINS.remove(domain)
+    BLOCKED_DOMAINS.discard(domain)
+    _policy_changed()
     logger.info(f"Removed domain from blocklist: {domain}")
     
     return {
@@ -126,16 +203,29 @@ async def list_domains():
     Returns:
         List of all blocked domains with metadata
     """
+    return Response(content=_domains_cache_bytes, media_type="application/json")
+
+
+@app.get("/policy/match")
+async def match_host(host: str):
+    """
+    Check whether a host is blocked by the current policy
+    
+    Args:
+        host: Hostname to check, optionally with a port (e.g., "www.facebook.com:443")
+    """
+    matched = _match_blocked(host)
     return {
-        "domains": sorted(BLOCKED_DOMAINS),
-        "total": len(BLOCKED_DOMAINS)
+        "host": host,
+        "blocked": matched is not None,
+        "matched": matched
     }
 
 
 @app.get("/health")
 async def health_check():
     """Kubernetes/container health check endpoint"""
-    return {"status": "healthy"}
+    return Response(content=_HEALTH_BODY, media_type="application/json")
 
 
 if __name__ == "__main__":
@@ -21,6 +21,7 @@ type ProxyServer struct {
 	blocklist      map[string]bool
 	blocklistMutex sync.RWMutex
 	policyURL      string
+	policyETag     string
 }
 
 // NewProxyServer creates a new proxy server instance
@@ -33,12 +34,26 @@ func NewProxyServer(policyURL string) *ProxyServer {
 
 // UpdateBlocklist fetches the blocklist from the policy engine
 func (ps *ProxyServer) UpdateBlocklist() error {
-	resp, err := http.Get(ps.policyURL)
+	req, err := http.NewRequest(http.MethodGet, ps.policyURL, nil)
+	if err != nil {
+		return fmt.Errorf("failed to build policy request: %w", err)
+	}
+	// Revalidate against the last policy we applied; the engine answers 304 if unchanged
+	if ps.policyETag != "" {
+		req.Header.Set("If-None-Match", ps.policyETag)
+	}
+
+	resp, err := http.DefaultClient.Do(req)
 	if err != nil {
 		return fmt.Errorf("failed to fetch policy: %w", err)
 	}
 	defer resp.Body.Close()
 
+	if resp.StatusCode == http.StatusNotModified {
+		log.Println("Blocklist unchanged")
+		return nil
+	}
+
 	if resp.StatusCode != http.StatusOK {
 		return fmt.Errorf("policy engine returned status: %d", resp.StatusCode)
 	}
@@ -59,6 +74,8 @@ func (ps *ProxyServer) UpdateBlocklist() error {
 		log.Printf("Blocked domain: %s", domain)
 	}
 
+	ps.policyETag = resp.Header.Get("ETag")
+
 	log.Printf("Blocklist updated: %d domains blocked", len(ps.blocklist))
 	return nil
 }